@@ -1,15 +1,24 @@
 from os.path import dirname, join
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
 import os
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import applemusicpy as applemusic
 from dotenv import load_dotenv
-import time
+from rapidfuzz import fuzz
+import asyncio
+import aiohttp
+import logging
+import orjson
 import re
 
 dotenv_path = join(dirname(__file__), '.env')
 load_dotenv(dotenv_path)
 
+log = logging.getLogger(__name__)
+
 # Constants for Spotify and Apple Music
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
@@ -21,132 +30,568 @@ APPLE_SECRET_KEY_PATH = os.getenv('APPLE_SECRET_KEY_PATH')
 APPLE_KEY_ID = os.getenv('APPLE_KEY_ID')
 APPLE_TEAM_ID = os.getenv('APPLE_TEAM_ID')
 
-
-def get_apple_music_tracks(playlist_id):
-    """Fetches ALL track details from an Apple Music playlist by handling pagination."""
+APPLE_MUSIC_API_ROOT = 'https://api.music.apple.com/v1/'
+APPLE_MUSIC_STOREFRONT = 'us'
+# Maximum number of Apple Music pages in flight at once
+APPLE_MUSIC_PAGE_CONCURRENCY = 5
+APPLE_MUSIC_PAGE_SIZE = 100
+
+SPOTIFY_API_ROOT = 'https://api.spotify.com/v1/'
+# Maximum number of Spotify searches in flight at once
+SPOTIFY_SEARCH_CONCURRENCY = 10
+# Maximum number of Apple Music tracks waiting to be searched on Spotify
+TRACK_QUEUE_SIZE = 500
+# Maximum number of Spotify playlist reads or removals in flight at once
+SPOTIFY_PLAYLIST_CONCURRENCY = 3
+# Spotify returns and accepts at most 100 playlist tracks per request
+SPOTIFY_PLAYLIST_PAGE_SIZE = 100
+
+# Spotify OAuth token cached between runs
+SPOTIFY_TOKEN_CACHE_PATH = join(dirname(__file__), '.cache-spotify')
+
+# How many results a title and artist search fetches to check against the Apple Music track
+SPOTIFY_MATCH_CANDIDATES = 5
+# The lowest fuzzy match score a title and artist search result can have and still be accepted
+MIN_MATCH_SCORE = 70
+
+# Spotify search results from previous runs, keyed by ISRC or by normalized artist and song name
+SPOTIFY_CACHE_PATH = join(dirname(__file__), '.spotify_cache.json')
+# The cache drops its least recently used entries beyond this size
+SPOTIFY_CACHE_MAX_ENTRIES = 50_000
+
+# Marks a search cache probe that found a query which hasn't been searched yet
+MISSING = object()
+
+# Connection pool size for the shared HTTP session, overall and per API host
+HTTP_CONNECTION_LIMIT = 20
+HTTP_CONNECTION_LIMIT_PER_HOST = 10
+
+# How many times a rate-limited or failed request is attempted before giving up
+MAX_REQUEST_ATTEMPTS = 6
+
+# How many tracks are searched between progress messages
+PROGRESS_INTERVAL = 50
+
+# Strips bracketed suffixes such as (feat. ...), (with ...) or [Remastered] from song titles
+_CLEAN_RE = re.compile(r'\s*\([^)]*\)|\s*\[[^\]]*\]')
+
+
+def _create_session():
+    """Creates the HTTP session shared by all Apple Music and Spotify requests."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONNECTION_LIMIT,
+        limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+class SpotifyToken:
+    """Shares one Spotify access token across all requests, refreshing it only when Spotify rejects it."""
+
+    def __init__(self, auth_manager):
+        self.auth_manager = auth_manager
+        self.headers = {'Authorization': f"Bearer {auth_manager.get_access_token(as_dict=False)}"}
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self, rejected_headers):
+        """Refreshes the token after a 401, unless another request has already replaced the rejected one."""
+        async with self._refresh_lock:
+            if rejected_headers is not self.headers:
+                return
+
+            # Reading the token cache and refreshing are both blocking, so keep them off the event loop
+            token_info = await asyncio.to_thread(self._refresh_token_info)
+            self.headers = {'Authorization': f"Bearer {token_info['access_token']}"}
+
+    def _refresh_token_info(self):
+        """Reads the raw cached token and exchanges its refresh token for a new access token."""
+        # Read through the cache handler, as the auth manager's own lookup may already refresh an expired token
+        token_info = self.auth_manager.cache_handler.get_cached_token()
+        if not token_info or not token_info.get('refresh_token'):
+            raise RuntimeError("Spotify rejected the access token and there is no cached refresh token. "
+                               "Run the sync again to re-authenticate.")
+        return self.auth_manager.refresh_access_token(token_info['refresh_token'])
+
+async def _request_json(session, method, url, token=None, **kwargs):
+    """Issues an HTTP request and returns the decoded JSON body.
+
+    Spotify requests pass their SpotifyToken, which is refreshed and retried once if it's rejected.
+    Rate-limited (429) responses are retried after the delay the server asks for in Retry-After,
+    and server errors and dropped connections are retried with exponential backoff.
+    """
+    refreshed = False
+    for attempt in range(MAX_REQUEST_ATTEMPTS):
+        last_attempt = attempt == MAX_REQUEST_ATTEMPTS - 1
+        if token:
+            kwargs['headers'] = token.headers
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                if response.status == 401 and token and not refreshed and not last_attempt:
+                    await token.refresh(kwargs['headers'])
+                    refreshed = True
+                    continue
+                if response.status == 429 and not last_attempt:
+                    # Retry-After can also be an HTTP date, in which case we back off exponentially instead
+                    retry_after = response.headers.get('Retry-After', '').strip()
+                    delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+                elif response.status >= 500 and not last_attempt:
+                    delay = 2 ** attempt
+                else:
+                    response.raise_for_status()
+                    body = await response.read()
+                    return orjson.loads(body) if body else None
+
+            log.warning("Request to %s returned %s, retrying in %ss...", response.url.host, response.status, delay)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            # Dropped or timed-out connections (e.g. a stale pooled keep-alive) are worth another try
+            if last_attempt:
+                raise
+            delay = 2 ** attempt
+            log.warning("Request to %s failed (%r), retrying in %ss...", url, e, delay)
+
+        await asyncio.sleep(delay)
+
+def _extract_apple_tracks(page_of_tracks):
+    """Pulls the artist, song name and ISRC out of one page of Apple Music playlist tracks."""
+    tracks = []
+    for track in page_of_tracks:
+        # Some tracks might be unavailable or malformed, skip them
+        if 'attributes' in track and 'artistName' in track['attributes'] and 'name' in track['attributes']:
+            artist = track['attributes']['artistName']
+            song_name = track['attributes']['name']
+            isrc = track['attributes'].get('isrc')
+            cleaned_name = _CLEAN_RE.sub('', song_name).strip()
+            tracks.append({'artist': artist, 'name': song_name, 'clean_name': cleaned_name, 'isrc': isrc})
+    return tracks
+
+async def _fetch_apple_page(session, sem, url, headers, offset):
+    """Fetches one page of Apple Music playlist tracks starting at the given offset."""
+    params = {'limit': APPLE_MUSIC_PAGE_SIZE, 'offset': offset}
+    async with sem:
+        return await _request_json(session, 'GET', url, params=params, headers=headers)
+
+async def _queue_apple_tracks(queue, page_of_tracks, offset):
+    """Queues the usable tracks from one page for searching and returns how many there were.
+
+    Each track is tagged with its (offset, index) so the playlist order can be restored later.
+    """
+    tracks = _extract_apple_tracks(page_of_tracks)
+    for i, track in enumerate(tracks):
+        await queue.put(((offset, i), track))
+    return len(tracks)
+
+async def _fetch_and_queue_apple_page(session, sem, url, headers, queue, offset):
+    """Fetches one page of Apple Music playlist tracks and queues them as soon as it arrives."""
+    results = await _fetch_apple_page(session, sem, url, headers, offset)
+    return await _queue_apple_tracks(queue, results['data'], offset)
+
+@lru_cache(maxsize=1)
+def _apple_client():
+    """Reads the Apple Music key and builds the client once, since that signs a new developer token."""
+    with open(APPLE_SECRET_KEY_PATH, 'r') as f:
+        secret_key = f.read()
+    return applemusic.AppleMusic(secret_key=secret_key, key_id=APPLE_KEY_ID, team_id=APPLE_TEAM_ID)
+
+async def get_apple_music_tracks(session, playlist_id, queue):
+    """Fetches ALL track details from an Apple Music playlist, queueing each page's tracks as it arrives.
+
+    Returns the number of tracks queued, or None if the playlist couldn't be fetched.
+    """
     print("-> Connecting to Apple Music...")
     try:
-        with open(APPLE_SECRET_KEY_PATH, 'r') as f:
-            secret_key = f.read()
-        am = applemusic.AppleMusic(secret_key=secret_key, key_id=APPLE_KEY_ID, team_id=APPLE_TEAM_ID)
+        am = _apple_client()
+        # The developer token expires after the client's session length, so re-sign it if it has run out
+        if not am.token_is_valid():
+            am.generate_token(am.session_length)
 
-        all_tracks = []
-        offset = 0
+        url = f"{APPLE_MUSIC_API_ROOT}catalog/{APPLE_MUSIC_STOREFRONT}/playlists/{playlist_id}/tracks"
+        headers = {'Authorization': f"Bearer {am.token_str}"}
+        sem = asyncio.Semaphore(APPLE_MUSIC_PAGE_CONCURRENCY)
 
         print("-> Fetching all tracks from Apple Music playlist (this may take a moment for large playlists)...")
-        # Loop to get all pages of tracks
-        while True:
-            # Fetch one page of tracks using the offset parameter
-            # The limit is max 100 per request
-            results = am.playlist_relationship(playlist_id, 'tracks', limit=100, offset=offset)
-
-            page_of_tracks = results['data']
-
-            # Process the tracks on the current page
-            for track in page_of_tracks:
-                # Some tracks might be unavailable or malformed, skip them
-                if 'attributes' in track and 'artistName' in track['attributes'] and 'name' in track['attributes']:
-                    artist = track['attributes']['artistName']
-                    song_name = track['attributes']['name']
-                    all_tracks.append({'artist': artist, 'name': song_name})
-
-            # If we received less than 100 tracks, it must be the last page
-            if len(page_of_tracks) < 100:
-                print(f"  > Reached the end of the playlist.")
-                break
-
-            # Otherwise, increase the offset to get the next page in the next loop
-            offset += 100
-            print(f"  > Fetched {len(all_tracks)} tracks so far...")
-
-            time.sleep(0.2)  # Small delay to avoid hitting API rate limits
-
-        print(f"-> Found a total of {len(all_tracks)} tracks in the Apple Music playlist.")
-        return all_tracks
+        # The first page tells us how many tracks there are in total
+        results = await _fetch_apple_page(session, sem, url, headers, 0)
+        track_count = await _queue_apple_tracks(queue, results['data'], 0)
+        total = results.get('meta', {}).get('total')
+
+        if total is not None:
+            # Every remaining offset is known up front, so fetch them all at once
+            offsets = range(APPLE_MUSIC_PAGE_SIZE, total, APPLE_MUSIC_PAGE_SIZE)
+            pages = [
+                asyncio.ensure_future(_fetch_and_queue_apple_page(session, sem, url, headers, queue, o))
+                for o in offsets
+            ]
+            try:
+                track_count += sum(await asyncio.gather(*pages))
+            finally:
+                # If one page fails, stop the others so they don't keep queueing tracks after we've given up
+                for page in pages:
+                    page.cancel()
+                await asyncio.gather(*pages, return_exceptions=True)
+        else:
+            # Without a total we have to walk the pages one at a time until a short page comes back
+            offset = 0
+            while len(results['data']) == APPLE_MUSIC_PAGE_SIZE:
+                offset += APPLE_MUSIC_PAGE_SIZE
+                log.debug("Fetched %d Apple Music tracks so far...", track_count)
+                results = await _fetch_apple_page(session, sem, url, headers, offset)
+                track_count += await _queue_apple_tracks(queue, results['data'], offset)
+
+        print(f"-> Found a total of {track_count} tracks in the Apple Music playlist.")
+        return track_count
 
     except Exception as e:
         print(f"Error connecting to Apple Music or fetching playlist: {e}")
         return None
 
-def find_spotify_tracks(sp, apple_tracks):
-    """Searches for Apple Music tracks on Spotify automatically."""
-    print("-> Searching for tracks on Spotify...")
-    found_tracks = []
-    not_found_tracks = []
+async def _search_spotify(session, token, query, limit=1):
+    """Runs a single Spotify track search and returns the matching items."""
+    params = {'q': query, 'type': 'track', 'limit': limit}
+    result = await _request_json(session, 'GET', SPOTIFY_API_ROOT + 'search', params=params, token=token)
+    return result['tracks']['items']
+
+class SearchCache:
+    """On-disk cache of Spotify search results that evicts the least recently used entries once full."""
+
+    def __init__(self, path, max_entries=SPOTIFY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
 
-    for i, track in enumerate(apple_tracks):
-        artist = track['artist']
-        name = track['name']
+    def __contains__(self, key):
+        return key in self._entries
 
-        query = f"track:{name} artist:{artist}"
-        print(f"  ({i + 1}/{len(apple_tracks)}) Searching for: '{name}' by '{artist}'")
+    def __getitem__(self, key):
+        self._entries.move_to_end(key)
+        return self._entries[key]
 
+    def __setitem__(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self):
+        """Loads the cache from disk, or starts an empty one."""
         try:
-            # --- First Attempt: Exact match ---
-            query = f"track:{name} artist:{artist}"
-            result = sp.search(q=query, type='track', limit=1)
-
-            # --- Second Attempt: Clean the title if the first attempt fails ---
-            if not result['tracks']['items']:
-                print("  > No exact match found. Cleaning title and trying again...")
-                # Use regex to remove (feat. ...), (with ...), etc.
-                cleaned_name = re.sub(r'\s*\([^)]*\)|\s*\[[^\]]*\]', '', name).strip()
-
-                if cleaned_name != name:  # Only search again if the name was actually changed
-                    print(f"  > Cleaned title: '{cleaned_name}'")
-                    query = f"track:{cleaned_name} artist:{artist}"
-                    result = sp.search(q=query, type='track', limit=1)
-
-            # --- Process the final result ---
-            if result['tracks']['items']:
-                top_result = result['tracks']['items'][0]
-                print(f"  > Found on Spotify: '{top_result['name']}' by '{top_result['artists'][0]['name']}'")
-                found_tracks.append({
+            with open(self.path, 'rb') as f:
+                entries = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return
+
+        if not isinstance(entries, dict):
+            log.warning("Ignoring search cache at %s, it doesn't hold a JSON object.", self.path)
+            return
+        # Entries are saved oldest first, so loading them in order restores the LRU order
+        for key, value in entries.items():
+            self[key] = value
+
+    def save(self):
+        """Writes the cache back to disk."""
+        # Write to a temporary file and swap it in, so an interrupted save can't truncate the old cache
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(orjson.dumps(self._entries))
+        os.replace(temp_path, self.path)
+
+def _cache_key(artist, name):
+    """Builds the search cache key for an artist and song name."""
+    return f"{artist.lower().strip()}|{name.lower().strip()}"
+
+def _search_queries(track):
+    """Lists the (cache key, Spotify query, needs validation) triples to try for a track, most precise first."""
+    artist = track['artist']
+    name = track['name']
+    cleaned_name = track['clean_name']
+
+    queries = []
+    # --- First Attempt: ISRC, which identifies the exact recording ---
+    if track.get('isrc'):
+        queries.append((f"isrc:{track['isrc'].lower()}", f"isrc:{track['isrc']}", False))
+
+    # --- Second Attempt: Exact match on title and artist ---
+    queries.append((_cache_key(artist, name), f"track:{name} artist:{artist}", True))
+
+    # --- Third Attempt: Clean the title if the name search fails ---
+    if cleaned_name != name:  # Only search again if the name was actually changed
+        queries.append((_cache_key(artist, cleaned_name), f"track:{cleaned_name} artist:{artist}", True))
+    return queries
+
+def _best_match(track, items):
+    """Picks the search result that best matches the Apple Music track, or None if none is close enough."""
+    wanted = f"{track['name']} {track['artist']}"
+    # Longer titles carry more noise such as edition tags, so they get a slightly lower bar
+    threshold = max(MIN_MATCH_SCORE, 90 - len(track['name']) // 4)
+
+    # Ties go to the earlier result, so Spotify's own ranking decides between equally good matches
+    best_result, best_score = None, threshold
+    for item in items:
+        score = fuzz.token_set_ratio(wanted, f"{item['name']} {item['artists'][0]['name']}")
+        if score > best_score or (best_result is None and score >= threshold):
+            best_result, best_score = item, score
+    return best_result
+
+def _probe_cache(cache, queries):
+    """Looks a track's queries up in the search cache without touching the network.
+
+    Queries are checked in order, so a cached match is only returned once every more precise query
+    before it is a cached miss. Returns that match, None if every query is a cached miss, or MISSING
+    as soon as a query turns up that still has to be searched.
+    """
+    for key, _, _ in queries:
+        if key not in cache:
+            return MISSING
+        if cache[key]:
+            return cache[key]
+    return None
+
+async def _search_one(session, token, cache, track):
+    """Searches Spotify for one Apple Music track by ISRC, falling back to its title and artist."""
+    artist = track['artist']
+    name = track['name']
+    queries = _search_queries(track)
+
+    # Check every query in the cache first, a cached None means an earlier search found nothing
+    found = _probe_cache(cache, queries)
+    if found is not MISSING:
+        return (found, None) if found else (None, f"{artist} - {name}")
+
+    log.debug("Searching for: '%s' by '%s'", name, artist)
+    found = None
+    try:
+        for key, query, validate in queries:
+            # Another worker may have searched this query while we were waiting on an earlier one
+            if key in cache:
+                found = cache[key]
+                if found:
+                    break
+                continue
+
+            if validate:
+                # Name searches can return a different edit, so fetch a few candidates and check them
+                items = await _search_spotify(session, token, query, limit=SPOTIFY_MATCH_CANDIDATES)
+                top_result = _best_match(track, items)
+            else:
+                items = await _search_spotify(session, token, query)
+                top_result = items[0] if items else None
+
+            if top_result:
+                found = {
                     'id': top_result['id'],
                     'artist': top_result['artists'][0]['name'],
                     'name': top_result['name']
-                })
-            else:
-                print("  > Could not find a match after cleaning.")
-                not_found_tracks.append(f"{artist} - {name}")
+                }
+            cache[key] = found
+            if found:
+                break
+
+    except Exception as e:
+        log.warning("An error occurred while searching for '%s': %s", name, e)
+        return None, f"{artist} - {name} (Error during search)"
+
+    # --- Process the final result ---
+    if found:
+        log.debug("Found on Spotify: '%s' by '%s'", found['name'], found['artist'])
+        return found, None
+
+    log.debug("Could not find a match for '%s' by '%s'.", name, artist)
+    return None, f"{artist} - {name}"
+
+async def _search_worker(session, token, cache, queue, searches, entries):
+    """Pulls tracks off the queue and searches Spotify for them until it reads the None sentinel."""
+    while True:
+        item = await queue.get()
+        if item is None:
+            # Put the sentinel back so the other workers see it too
+            queue.put_nowait(None)
+            return
+
+        order, track = item
+        key = _cache_key(track['artist'], track['name'])
+        entries.append((order, key))
+        processed = len(entries)
+
+        # Search each distinct song only once, even if it appears in the playlist several times
+        if key not in searches:
+            searches[key] = asyncio.ensure_future(_search_one(session, token, cache, track))
+            await searches[key]
+
+        if processed % PROGRESS_INTERVAL == 0:
+            log.info("  > Processed %d tracks so far...", processed)
+
+async def find_spotify_tracks(session, token, queue):
+    """Searches for Apple Music tracks on Spotify concurrently as they arrive on the queue."""
+    print("-> Searching for tracks on Spotify...")
+    found_tracks = []
+    not_found_tracks = []
 
-        except Exception as e:
-            print(f"    - An error occurred while searching for '{name}': {e}")
-            not_found_tracks.append(f"{artist} - {name} (Error during search)")
+    cache = SearchCache(SPOTIFY_CACHE_PATH)
+    cache.load()
+    searches = {}
+    entries = []
 
-        time.sleep(0.1)  # A smaller delay is fine for this non-interactive version
+    # Each worker has one search in flight at a time, which also paces us against rate limits
+    workers = [
+        asyncio.ensure_future(_search_worker(session, token, cache, queue, searches, entries))
+        for _ in range(SPOTIFY_SEARCH_CONCURRENCY)
+    ]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # If one worker fails, don't leave the others waiting on the queue
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    cache.save()
+
+    # Pages arrive in any order, so sort back into the Apple Music playlist order
+    for order, key in sorted(entries):
+        found, not_found = searches[key].result()
+        if found:
+            # Normalize the artist once here rather than on every comparison while sorting
+            found_tracks.append({**found, 'artist_key': found['artist'].lower()})
+        else:
+            not_found_tracks.append(not_found)
 
     print(f"\n-> Search complete.")
     return found_tracks, not_found_tracks
 
-def update_spotify_playlist(sp, playlist_id, track_ids):
-    """Clears and updates a Spotify playlist with new tracks."""
-    if not track_ids:
+async def find_tracks_to_sync(session, token, apple_playlist_id):
+    """Fetches the Apple Music playlist and searches Spotify for its tracks at the same time.
+
+    Returns the found and not-found tracks, or None if the Apple Music playlist couldn't be fetched.
+    """
+    queue = asyncio.Queue(maxsize=TRACK_QUEUE_SIZE)
+    search = asyncio.create_task(find_spotify_tracks(session, token, queue))
+    fetch = asyncio.create_task(get_apple_music_tracks(session, apple_playlist_id, queue))
+    close = None
+    try:
+        # The search only finishes after reading the sentinel, so if it finishes first it has failed and
+        # nothing is draining the queue any more. Waiting on it alongside each step keeps a full queue
+        # from blocking us forever.
+        await asyncio.wait([fetch, search], return_when=asyncio.FIRST_COMPLETED)
+        if fetch.done():
+            # Tell the search workers that no more tracks are coming
+            close = asyncio.create_task(queue.put(None))
+            await asyncio.wait([close, search], return_when=asyncio.FIRST_COMPLETED)
+        results = await search
+    finally:
+        tasks = [task for task in (fetch, search, close) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not fetch.result():
+        return None
+    return results
+
+def _track_uris(track_ids):
+    """Turns Spotify track IDs into track URIs."""
+    return [f"spotify:track:{track_id}" for track_id in track_ids]
+
+async def _fetch_spotify_playlist_page(session, sem, url, token, offset):
+    """Fetches one page of a Spotify playlist's track IDs starting at the given offset."""
+    params = {'fields': 'items(track(id)),total', 'limit': SPOTIFY_PLAYLIST_PAGE_SIZE, 'offset': offset}
+    async with sem:
+        return await _request_json(session, 'GET', url, params=params, token=token)
+
+async def _fetch_spotify_playlist_ids(session, url, token):
+    """Fetches the IDs of every track currently in a Spotify playlist, in playlist order."""
+    sem = asyncio.Semaphore(SPOTIFY_PLAYLIST_CONCURRENCY)
+    first_page = await _fetch_spotify_playlist_page(session, sem, url, token, 0)
+    offsets = range(SPOTIFY_PLAYLIST_PAGE_SIZE, first_page['total'], SPOTIFY_PLAYLIST_PAGE_SIZE)
+    pages = [first_page] + await asyncio.gather(*[
+        _fetch_spotify_playlist_page(session, sem, url, token, o) for o in offsets
+    ])
+    # Local files and unavailable tracks come back without a track or an ID
+    return [item['track']['id'] if item['track'] else None for page in pages for item in page['items']]
+
+async def _replace_spotify_playlist(session, url, token, track_ids):
+    """Replaces the whole contents of a Spotify playlist with the given tracks."""
+    uris = _track_uris(track_ids)
+    # Replacing the playlist with the first chunk clears it and adds those tracks in one request
+    await _request_json(session, 'PUT', url, json={'uris': uris[:SPOTIFY_PLAYLIST_PAGE_SIZE]}, token=token)
+
+    # The remaining chunks are appended one at a time, as concurrent appends could land out of order
+    for i in range(SPOTIFY_PLAYLIST_PAGE_SIZE, len(uris), SPOTIFY_PLAYLIST_PAGE_SIZE):
+        chunk = uris[i:i + SPOTIFY_PLAYLIST_PAGE_SIZE]
+        await _request_json(session, 'POST', url, json={'uris': chunk}, token=token)
+
+async def _remove_spotify_tracks(session, sem, url, token, chunk):
+    """Removes every occurrence of a chunk of tracks from a Spotify playlist."""
+    body = {'tracks': [{'uri': uri} for uri in _track_uris(chunk)]}
+    async with sem:
+        await _request_json(session, 'DELETE', url, json=body, token=token)
+
+async def _apply_spotify_playlist_delta(session, url, token, current_ids, track_ids):
+    """Updates a Spotify playlist by removing and inserting only the tracks that changed.
+
+    Returns False without touching the playlist if the tracks it keeps are not already in the wanted
+    order, in which case only a full replace can produce the right result.
+    """
+    current_set = set(current_ids)
+    wanted_set = set(track_ids)
+    kept_ids = [track_id for track_id in current_ids if track_id in wanted_set]
+    if None in current_set or kept_ids != [track_id for track_id in track_ids if track_id in current_set]:
+        return False
+
+    # Removals don't depend on order, so they can all be sent at once
+    removes = list(current_set - wanted_set)
+    sem = asyncio.Semaphore(SPOTIFY_PLAYLIST_CONCURRENCY)
+    await asyncio.gather(*[
+        _remove_spotify_tracks(session, sem, url, token, removes[i:i + SPOTIFY_PLAYLIST_PAGE_SIZE])
+        for i in range(0, len(removes), SPOTIFY_PLAYLIST_PAGE_SIZE)
+    ])
+
+    # Insert each run of new tracks at its final position. Going front to back means everything
+    # before a run is already in place when it's inserted.
+    position = 0
+    while position < len(track_ids):
+        if track_ids[position] in current_set:
+            position += 1
+            continue
+        run_end = position
+        while run_end < len(track_ids) and run_end - position < SPOTIFY_PLAYLIST_PAGE_SIZE \
+                and track_ids[run_end] not in current_set:
+            run_end += 1
+        body = {'uris': _track_uris(track_ids[position:run_end]), 'position': position}
+        await _request_json(session, 'POST', url, json=body, token=token)
+        position = run_end
+
+    print(f"  > Removed {len(removes)} and added {len(track_ids) - len(kept_ids)} tracks.")
+    return True
+
+async def update_spotify_playlist(session, token, playlist_id, sorted_tracks):
+    """Updates a Spotify playlist so it holds exactly the given tracks, which must already be sorted by artist."""
+    if not sorted_tracks:
         print("No tracks to add. Exiting.")
         return
 
-    print("-> Sorting tracks by artist name...")
-    # Sort the list of dictionaries by the 'artist' key
-    sorted_tracks = sorted(track_ids, key=lambda x: x['artist'].lower())
     sorted_track_ids = [track['id'] for track in sorted_tracks]
 
     print(f"-> Updating Spotify playlist...")
+    url = f"{SPOTIFY_API_ROOT}playlists/{playlist_id}/tracks"
     try:
-        # Clear the playlist first
-        sp.playlist_replace_items(playlist_id, [])
+        current_ids = await _fetch_spotify_playlist_ids(session, url, token)
+        if current_ids == sorted_track_ids:
+            print("✅ Your Spotify playlist is already up to date.")
+            return
 
-        # Add tracks in chunks of 100 (Spotify API limit)
-        for i in range(0, len(sorted_track_ids), 100):
-            chunk = sorted_track_ids[i:i + 100]
-            sp.playlist_add_items(playlist_id, chunk)
+        # Only send the changes where we can, so tracks that stay keep their "date added"
+        if not await _apply_spotify_playlist_delta(session, url, token, current_ids, sorted_track_ids):
+            await _replace_spotify_playlist(session, url, token, sorted_track_ids)
 
         print("✅ Success! Your Spotify playlist has been updated and sorted by artist.")
     except Exception as e:
         print(f"Error updating Spotify playlist: {e}")
 
-
-def main():
+async def main():
     """Main function to run the sync process."""
+    # Per-track details are logged at DEBUG, so only progress and warnings show by default
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Authenticate with Spotify
     scope = "playlist-modify-public"
     try:
@@ -155,53 +600,58 @@ def main():
             client_secret=SPOTIFY_CLIENT_SECRET,
             redirect_uri=SPOTIFY_REDIRECT_URI,
             scope=scope,
-            username=SPOTIFY_USERNAME
+            username=SPOTIFY_USERNAME,
+            # Reusing the cached token skips the OAuth round-trip on every run after the first
+            cache_path=SPOTIFY_TOKEN_CACHE_PATH,
+            open_browser=False
         ))
         sp.me()
+        token = SpotifyToken(sp.auth_manager)
     except Exception as e:
         print(f"Could not authenticate with Spotify. Please check your credentials. Error: {e}")
         return
 
-    # Get tracks from Apple Music
-    apple_tracks = get_apple_music_tracks(APPLE_PLAYLIST_ID)
-    if not apple_tracks:
-        return
+    # One session keeps connections to both APIs warm for the whole run
+    async with _create_session() as session:
+        # Get tracks from Apple Music and find the corresponding tracks on Spotify as they come in
+        results = await find_tracks_to_sync(session, token, APPLE_PLAYLIST_ID)
+        if not results:
+            return
+        spotify_tracks, not_found_tracks = results
 
-    # Find corresponding tracks on Spotify
-    spotify_tracks, not_found_tracks = find_spotify_tracks(sp, apple_tracks)
+        # Sort by artist once, the review below and the playlist update both use this order
+        spotify_tracks.sort(key=itemgetter('artist_key'))
 
-    # --- Confirmation Step ---
-    print("\n" + "=" * 50)
-    print("                 SYNC REVIEW")
-    print("=" * 50)
+        # --- Confirmation Step ---
+        print("\n" + "=" * 50)
+        print("                 SYNC REVIEW")
+        print("=" * 50)
 
-    if not_found_tracks:
-        print("\n❌ The following songs could not be found on Spotify:")
-        for item in not_found_tracks:
-            print(f"  - {item}")
+        if not_found_tracks:
+            print("\n❌ The following songs could not be found on Spotify:")
+            for item in not_found_tracks:
+                print(f"  - {item}")
 
-    if spotify_tracks:
-        print("\n✅ The following songs will be synced to your Spotify playlist, sorted by artist:")
-        # Sort for display purposes, the final sort happens in the update function
-        sorted_display_tracks = sorted(spotify_tracks, key=lambda x: x['artist'].lower())
-        for track in sorted_display_tracks:
-            print(f"  - {track['artist']} - {track['name']}")
+        if spotify_tracks:
+            print("\n✅ The following songs will be synced to your Spotify playlist, sorted by artist:")
+            for track in spotify_tracks:
+                print(f"  - {track['artist']} - {track['name']}")
 
-    print("=" * 50)
+        print("=" * 50)
 
-    if not spotify_tracks:
-        print("\nNo tracks to sync. Exiting.")
-        return
+        if not spotify_tracks:
+            print("\nNo tracks to sync. Exiting.")
+            return
 
-    # Ask for final confirmation
-    proceed = input("\nDo you want to proceed with updating the Spotify playlist? (y/n): ").lower()
+        # Ask for final confirmation
+        proceed = input("\nDo you want to proceed with updating the Spotify playlist? (y/n): ").lower()
 
-    if proceed == 'y':
-        # If confirmed, update the Spotify playlist
-        update_spotify_playlist(sp, SPOTIFY_PLAYLIST_ID, spotify_tracks)
-    else:
-        print("\nSync cancelled by user.")
+        if proceed == 'y':
+            # If confirmed, update the Spotify playlist
+            await update_spotify_playlist(session, token, SPOTIFY_PLAYLIST_ID, spotify_tracks)
+        else:
+            print("\nSync cancelled by user.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file